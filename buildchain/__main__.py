@@ -1,14 +1,20 @@
 import argparse
+import functools
+import io
+import math
 import os
 import sys
 import shutil
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Optional, List
+from typing import Callable, Dict, Optional, List, Tuple
 from . import cli
 from .libc import LibC
 from .ninja_syntax import Writer
 from .packages import Cygwin
 from .patches import Patch
+from .target import TargetTriple
 
 
 CYGWIN_x86_MIRROR_SITE = "https://mirrors.kernel.org/sourceware/cygwin-archive/20221123"
@@ -19,59 +25,239 @@ LINUX_SITE = "https://cdn.kernel.org/pub/linux/kernel/v6.x"
 MINGW_W64_SITE = "https://sourceforge.net/projects/mingw-w64/files/mingw-w64/mingw-w64-release"
 MUSL_SITE = "https://www.musl-libc.org"
 
+# https://git.kernel.org/pub/scm/linux/kernel/git/stable/linux.git/tree/arch
+LINUX_ARCHS = (
+    ("aarch64", "arm64"),
+    ("arm", "arm"),
+    ("microblaze", "microblaze"),
+    ("mips", "mips"),
+    ("or1k", "openrisc"),
+    ("powerpc", "powerpc"),
+    ("riscv", "riscv"),
+    ("s390", "s390"),
+    ("sh", "sh"),
+    ("x86_64", "x86_64"),
+)
+
+# gcc configure flags implied by the target triple
+GCC_TRIPLE_FLAGS = (
+    (lambda t: "fdpic" in t, "--enable-fdpic"),
+    (lambda t: t.startswith("x86_64") and t.endswith("x32"), "--with-abi=x32"),
+    (lambda t: "powerpc64" in t, "--with-abi=elfv2"),
+    (lambda t: ("mips64" in t or "mipsisa64" in t) and "n32" in t, "--with-abi=n32"),
+    (lambda t: ("mips64" in t or "mipsisa64" in t) and "n32" not in t, "--with-abi=64"),
+    (lambda t: "s390x" in t, "--with-long-double-128"),
+    (lambda t: t.endswith("sf"), "--with-float=soft"),
+    (lambda t: t.endswith("hf"), "--with-float=hard"),
+)
+
+TAR_FLAGS = {"bz2": "j", "gz": "z", "xz": "J"}
+
+
+@dataclass(frozen=True, slots=True)
+class Component:
+    name: str
+    version: str
+    compression: str
+    url: str
+
+
+@dataclass(frozen=True, slots=True)
+class LibcMeta:
+    # prefix of the $<name>_version, $<name>_site, $<name>_tarball... variables
+    name: str
+    compression: str
+    url: str
+    site: Optional[str] = None
+
+
+@dataclass(frozen=True, slots=True)
+class AutotoolsPackage:
+    # names its configure-, build-, install-...-sysroot and install- rules
+    name: str
+    description: str
+    # ninja variable holding the build dir, e.g. $glibc_build_dir
+    build_dir: str
+    configure: str = ""
+    configure_env: Tuple[str, ...] = ()
+    configure_flags: Tuple[str, ...] = ()
+    configure_deps: Tuple[str, ...] = ()
+    # written by configure
+    makefile: str = "Makefile"
+    make_env: Tuple[str, ...] = ()
+    make_flags: Tuple[str, ...] = ()
+    build_deps: Tuple[str, ...] = ()
+    sysroot_deps: Tuple[str, ...] = ()
+    # commands run after make install, {destdir} is replaced with DESTDIR
+    post_install: Tuple[str, ...] = ()
+
+    def makefile_path(self) -> str:
+        return f"{self.build_dir}/{self.makefile}"
+
+
+MINGW_W64_META = LibcMeta(
+    "mingw_w64",
+    "bz2",
+    "$mingw_w64_site/mingw-w64-v$mingw_w64_version.tar.bz2",
+    MINGW_W64_SITE,
+)
+LIBC_META = {
+    LibC.GLIBC: LibcMeta("glibc", "xz", "$gnu_site/glibc/glibc-$glibc_version.tar.xz"),
+    LibC.MSVCRT: MINGW_W64_META,
+    LibC.MUSL: LibcMeta("musl", "gz", "$musl_site/releases/musl-$musl_version.tar.gz", MUSL_SITE),
+    LibC.NEWLIB_CYGWIN: MINGW_W64_META,
+    LibC.UCRT: MINGW_W64_META,
+}
+
+# --libc values, "auto" picks the first libc whose part is in the target
+LIBC_NAMES = {libc.name(): libc for libc in LibC}
+LIBC_TARGETS = (
+    ("cygwin", LibC.NEWLIB_CYGWIN),
+    ("gnu", LibC.GLIBC),
+    ("mingw", LibC.UCRT),
+    ("musl", LibC.MUSL),
+)
+
+
+@functools.lru_cache(maxsize=None)
+def _which(cmd: str) -> Optional[str]:
+    return shutil.which(cmd)
+
+
+def _read_cgroup(path: str) -> Optional[List[str]]:
+    try:
+        return Path(path).read_text().split()
+    except OSError:
+        return None
+
 
+def _cpu_quota() -> Optional[int]:
+    # cgroup v2 "cpu.max" is "<quota> <period>" or "max <period>"
+    limit = _read_cgroup("/sys/fs/cgroup/cpu.max")
+
+    if limit is None:  # cgroup v1, quota is -1 when unlimited
+        quota = _read_cgroup("/sys/fs/cgroup/cpu/cpu.cfs_quota_us")
+        period = _read_cgroup("/sys/fs/cgroup/cpu/cpu.cfs_period_us")
+        limit = quota + period if quota and period else None
+
+    if not limit or limit[0] in ["max", "-1"]:
+        return None
+
+    return max(1, math.ceil(int(limit[0]) / int(limit[1])))
+
+
+def _memory() -> Optional[int]:
+    limit = _read_cgroup("/sys/fs/cgroup/memory.max")
+
+    if limit and limit[0] != "max":
+        return int(limit[0])
+
+    try:
+        return os.sysconf("SC_PHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def _cpu_count() -> int:
+    # cpus this process may run on (taskset, cgroup cpusets), not the machine
+    try:
+        count = len(os.sched_getaffinity(0))
+    except AttributeError:
+        count = os.cpu_count() or 1
+
+    quota = _cpu_quota()
+
+    if quota:
+        count = min(count, quota)
+
+    # gcc can take up to 2 GiB per job, more jobs than that only swaps
+    memory = _memory()
+
+    if memory:
+        count = min(count, memory // (2 << 30))
+
+    return max(1, count)
+
+
+CPU_COUNT = _cpu_count()
+ROOT_DIR = Path.cwd()
+
+# write_step_* methods in the order they are written to build.ninja, each with
+# an optional predicate deciding whether the step applies to the configuration
+_STEPS: List[Tuple[Callable, Optional[Callable]]] = []
+
+
+def _step(fn: Optional[Callable] = None, *, when: Optional[Callable] = None):
+    def register(fn: Callable) -> Callable:
+        _STEPS.append((fn, when))
+        return fn
+
+    return register(fn) if fn else register
+
+
+# glibc and musl need their headers, libgcc and libc built in between gcc steps
+def _no_mingw_w64_runtime(args: "Args") -> bool:
+    return not args.libc.requires_mingw_w64()
+
+
+@dataclass(slots=True)
 class Args:
-    no_patches = (bool,)
-    prefix = (str,)
-
-    host = (Optional[str],)
-    target = (str,)
-
-    cc = (str,)
-    cxx = (str,)
-    cc_build = (str,)
-    cxx_build = (str,)
-    cc_flags = (str,)
-    cxx_flags = (str,)
-    ld_flags = (str,)
-    enable_cache = (bool,)
-
-    binutils_flags = (List[str],)
-    gcc_flags = (List[str],)
-    gcc_with_isl = (bool,)
-    libc = (LibC,)
-    linux_headers = (bool,)
-
-    binutils_version = (str,)
-    cygwin_version = (str,)
-    gcc_version = (str,)
-    glibc_version = (str,)
-    gmp_version = (str,)
-    isl_version = (str,)
-    linux_version = (str,)
-    mpc_version = (str,)
-    mpfr_version = (str,)
-    mingw_w64_version = (str,)
-    musl_version = (str,)
-
-    _make = (str,)
-
-    def __init__(self, args: argparse.Namespace) -> None:
-        self.no_patches = args.no_patches
-
-        self.host = args.host
-        self.target = args.target
-
-        self.cc = args.cc
-        self.cxx = args.cxx
-        self.cc_build = args.cc_build
-        self.cxx_build = args.cxx_build
-        self.cc_flags = args.cc_flags
-        self.cxx_flags = args.cxx_flags
-        self.ld_flags = args.ld_flags
-        self.enable_cache = args.enable_cache
-
-        self.binutils_flags = [
+    no_patches: bool
+
+    host: Optional[str]
+    target: str
+    triple: TargetTriple
+
+    cc: str
+    cxx: str
+    cc_build: str
+    cxx_build: str
+    cc_flags: Optional[str]
+    cxx_flags: Optional[str]
+    ld_flags: Optional[str]
+    enable_cache: bool
+
+    binutils_flags: List[str]
+    gcc_flags: List[str]
+    gcc_with_isl: bool
+    libc: LibC
+    linux_headers: bool
+
+    binutils_version: str
+    cygwin_version: str
+    gcc_version: str
+    glibc_version: str
+    gmp_version: str
+    isl_version: str
+    linux_version: str
+    mpc_version: str
+    mpfr_version: str
+    mingw_w64_version: str
+    musl_version: str
+
+    _binutils_flags_str: str = field(init=False)
+    _components: List[Component] = field(init=False)
+    _decompressors: Dict[str, Optional[str]] = field(init=False, default_factory=dict)
+    _download: str = field(
+        init=False, default="curl -L --compressed --fail --retry 5 --retry-delay 2 -C - -o")
+    _gcc_flags_str: str = field(init=False)
+    _make: str = field(init=False, default="make")
+    _resolved_cc: str = field(init=False)
+    _resolved_cxx: str = field(init=False)
+    _wrapper: Optional[str] = field(init=False, default=None)
+
+    def __post_init__(self) -> None:
+        self._binutils_flags_str = " ".join(self.binutils_flags)
+        self._components = self._compute_components()
+        self._gcc_flags_str = " ".join(self.gcc_flags)
+        self._resolved_cc = self.cc
+        self._resolved_cxx = self.cxx
+
+    @classmethod
+    def from_namespace(cls, args: argparse.Namespace) -> "Args":
+        triple = TargetTriple.parse(args.target)
+
+        binutils_flags = [
             "--disable-multilib",
             "--disable-werror",
             "--libdir=/lib",
@@ -80,21 +266,21 @@ class Args:
             "--with-sysroot=/$target",
         ]
 
-        if self.host:
-            self.binutils_flags.append("--host=$host")
+        if args.host:
+            binutils_flags.append("--host=$host")
 
         if not args.no_default_configure:
             match args.libc:
                 case LibC.MUSL:
-                    self.binutils_flags.extend([
+                    binutils_flags.extend([
                         "--disable-separate-code",
                         "--enable-deterministic-archives",
                     ])
 
         if args.binutils_flags:
-            self.binutils_flags.extend(args.binutils_flags.split(" "))
+            binutils_flags.extend(args.binutils_flags.split(" "))
 
-        self.gcc_flags = [
+        gcc_flags = [
             "--disable-bootstrap",
             # https://wiki.musl-libc.org/open-issues.html#Sanitizer_compatibility
             "--disable-libsanitizer",
@@ -105,28 +291,32 @@ class Args:
             "--prefix=",
             "--target=$target",
             "--with-build-sysroot=$build_sysroot_dir",
+            "--with-gmp=$host_libs_dir",
+            "--with-mpc=$host_libs_dir",
+            "--with-mpfr=$host_libs_dir",
             "--with-sysroot=/$target",
         ]
 
-        if self.host:
-            self.gcc_flags.append("--host=$host")
+        if args.host:
+            gcc_flags.append("--host=$host")
+
+        if args.gcc_with_isl:
+            gcc_flags.append("--with-isl=$host_libs_dir")
 
         if not args.no_default_configure:
             match args.libc:
                 case LibC.MSVCRT | LibC.NEWLIB_CYGWIN | LibC.UCRT:
-                    self.gcc_flags.append("--enable-threads=posix")
+                    gcc_flags.append("--enable-threads=posix")
 
                     # https://github.com/brechtsanders/winlibs_mingw/issues/20
-                    arch = self.target.split("-")[0]
-
-                    if arch.startswith("i") and arch.endswith("86"):
-                        self.gcc_flags.extend([
+                    if triple.is_ix86():
+                        gcc_flags.extend([
                             "--disable-sjlj-exceptions",
                             "--with-dwarf2",
                         ])
 
                 case LibC.MUSL:  # https://github.com/richfelker/musl-cross-make/blob/master/litecross/Makefile
-                    self.gcc_flags.extend([
+                    gcc_flags.extend([
                         "--disable-assembly",
                         "--disable-gnu-indirect-function",
                         "--disable-libmpx",
@@ -136,49 +326,72 @@ class Args:
                         "--enable-tls",
                     ])
 
-            if "fdpic" in self.target:
-                self.gcc_flags.append("--enable-fdpic")
-
-            if self.target.startswith("x86_64") and self.target.endswith("x32"):
-                self.gcc_flags.append("--with-abi=x32")
-
-            if "powerpc64" in self.target:
-                self.gcc_flags.append("--with-abi=elfv2")
-
-            if "mips64" in self.target or "mipsisa64" in self.target:
-                if "n32" in self.target:
-                    self.gcc_flags.append("--with-abi=n32")
-                else:
-                    self.gcc_flags.append("--with-abi=64")
+            gcc_flags.extend(
+                flag for (predicate, flag) in GCC_TRIPLE_FLAGS if predicate(args.target)
+            )
 
-            if "s390x" in self.target:
-                self.gcc_flags.append("--with-long-double-128")
+        if args.gcc_flags:
+            gcc_flags.extend(args.gcc_flags.split(" "))
+
+        return cls(
+            no_patches=args.no_patches,
+            host=args.host,
+            target=args.target,
+            triple=triple,
+            cc=args.cc,
+            cxx=args.cxx,
+            cc_build=args.cc_build,
+            cxx_build=args.cxx_build,
+            cc_flags=args.cc_flags,
+            cxx_flags=args.cxx_flags,
+            ld_flags=args.ld_flags,
+            enable_cache=args.enable_cache,
+            binutils_flags=binutils_flags,
+            gcc_flags=gcc_flags,
+            gcc_with_isl=args.gcc_with_isl,
+            libc=args.libc,
+            linux_headers=args.linux_headers,
+            binutils_version=args.binutils_version,
+            cygwin_version=args.cygwin_version,
+            gcc_version=args.gcc_version,
+            glibc_version=args.glibc_version,
+            gmp_version=args.gmp_version,
+            isl_version=args.isl_version,
+            linux_version=args.linux_version,
+            mpc_version=args.mpc_version,
+            mpfr_version=args.mpfr_version,
+            mingw_w64_version=args.mingw_w64_version,
+            musl_version=args.musl_version,
+        )
+
+    def _compute_components(self) -> List[Component]:
+        components = [
+            Component("binutils", self.binutils_version, "xz",
+                      "$gnu_site/binutils/binutils-$binutils_version.tar.xz"),
+            Component("gcc", self.gcc_version, "xz",
+                      "$gnu_site/gcc/gcc-$gcc_version/gcc-$gcc_version.tar.xz"),
+            Component("gmp", self.gmp_version, "xz",
+                      "$gnu_site/gmp/gmp-$gmp_version.tar.xz"),
+        ]
 
-            if self.target.endswith("sf"):
-                self.gcc_flags.append("--with-float=soft")
-            elif self.target.endswith("hf"):
-                self.gcc_flags.append("--with-float=hard")
+        if self.gcc_with_isl:
+            components.append(Component(
+                "isl", self.isl_version, "xz", "$isl_site/isl-$isl_version.tar.xz"))
 
-        if args.gcc_flags:
-            self.gcc_flags.extend(args.gcc_flags.split(" "))
-
-        self.gcc_with_isl = args.gcc_with_isl
-        self.libc = args.libc
-        self.linux_headers = args.linux_headers
-
-        self.binutils_version = args.binutils_version
-        self.cygwin_version = args.cygwin_version
-        self.gcc_version = args.gcc_version
-        self.glibc_version = args.glibc_version
-        self.gmp_version = args.gmp_version
-        self.isl_version = args.isl_version
-        self.linux_version = args.linux_version
-        self.mpc_version = args.mpc_version
-        self.mpfr_version = args.mpfr_version
-        self.mingw_w64_version = args.mingw_w64_version
-        self.musl_version = args.musl_version
-
-        self._make = "make"
+        if self.linux_headers:
+            components.append(Component(
+                "linux", self.linux_version, "xz", "$linux_site/linux-$linux_version.tar.xz"))
+
+        libc_meta = LIBC_META[self.libc]
+        components.extend([
+            Component("mpc", self.mpc_version, "gz",
+                      "$gnu_site/mpc/mpc-$mpc_version.tar.gz"),
+            Component("mpfr", self.mpfr_version, "xz",
+                      "$gnu_site/mpfr/mpfr-$mpfr_version.tar.xz"),
+            Component(libc_meta.name, self.libc_archive_version(),
+                      libc_meta.compression, libc_meta.url),
+        ])
+        return components
 
     def dependencies_summary(self) -> None:
         print("\nDependencies:")
@@ -208,7 +421,7 @@ class Args:
 
     @staticmethod
     def _exists(cmd: str, msg: str) -> bool:
-        path = shutil.which(cmd)
+        path = _which(cmd)
         if path is not None:
             print(f"{msg}: {cmd} ({path})")
             return True
@@ -219,22 +432,42 @@ class Args:
     def try_get_tools(self):
         failed = False
 
+        if not self.is_cross():
+            self._resolved_cc = self.cc.replace("$host", self.host)
+            self._resolved_cxx = self.cxx.replace("$host", self.host)
+        else:
+            self._resolved_cc = self.cc_build
+            self._resolved_cxx = self.cxx_build
+
+        tools = [
+            self.cc_build,
+            self.cxx_build,
+            self._resolved_cc,
+            self._resolved_cxx,
+        ]
+
+        if self.enable_cache:
+            tools.extend(["ccache", "sccache"])
+
+        tools.extend([
+            "make", "gmake", "mingw32-make", "aria2c", "curl", "patch", "tar",
+            "sha256sum", "cmp", "xz", "pigz", "pbzip2",
+        ])
+
+        # warm up the cache, every probe walks the whole PATH
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(_which, tools))
+
         if not self._exists(self.cc_build, "Checking for build C compiler"):
             failed = True
         if not self._exists(self.cxx_build, "Checking for build C++ compiler"):
             failed = True
 
-        if self.host:
-            self.cc = self.cc.replace("$host", self.host).lstrip("-")
-            self.cxx = self.cxx.replace("$host", self.host).lstrip("-")
-
-            if not self._exists(self.cc, "Checking for host C compiler"):
+        if not self.is_cross():
+            if not self._exists(self._resolved_cc, "Checking for host C compiler"):
                 failed = True
-            if not self._exists(self.cxx, "Checking for host C++ compiler"):
+            if not self._exists(self._resolved_cxx, "Checking for host C++ compiler"):
                 failed = True
-        else:
-            self.cc = self.cc_build
-            self.cxx = self.cxx_build
 
         if self.enable_cache:
             ccache = self._exists("ccache", "Checking for tool ccache")
@@ -251,10 +484,7 @@ class Args:
 
             if wrapper:
                 print(f"Using {wrapper} as compiler wrapper")
-                self.cc = f"{wrapper} {self.cc}"
-                self.cxx = f"{wrapper} {self.cxx}"
-                self.cc_build = f"{wrapper} {self.cc_build}"
-                self.cxx_build = f"{wrapper} {self.cxx_build}"
+                self._wrapper = wrapper
 
         if self._exists("make", "Checking for tool make"):
             self._make = "make"
@@ -265,7 +495,9 @@ class Args:
         else:
             failed = True
 
-        if not self._exists("curl", "Checking for tool curl"):
+        if self._exists("aria2c", "Checking for tool aria2c"):
+            self._download = "aria2c -x 8 -s 8 --file-allocation=none --allow-overwrite=true --auto-file-renaming=false -o"
+        elif not self._exists("curl", "Checking for tool curl"):
             failed = True
 
         if not self._exists("patch", "Checking for tool patch"):
@@ -274,21 +506,166 @@ class Args:
         if not self._exists("tar", "Checking for tool tar"):
             failed = True
 
+        # extract-tar skips tarballs whose checksum it has seen before
+        if not self._exists("sha256sum", "Checking for tool sha256sum"):
+            failed = True
+
+        if not self._exists("cmp", "Checking for tool cmp"):
+            failed = True
+
+        # multithreaded decompressors run by tar -I, which adds -d, tar falls
+        # back to its own otherwise
+        if self._exists("xz", "Checking for tool xz"):
+            self._decompressors["xz"] = "xz -T0"
+        if self._exists("pigz", "Checking for tool pigz"):
+            self._decompressors["gz"] = "pigz"
+        if self._exists("pbzip2", "Checking for tool pbzip2"):
+            self._decompressors["bz2"] = "pbzip2"
+
         return failed
 
     def is_cross(self) -> bool:
-        self.host is None
+        # plain cross toolchain (build == host), otherwise it's a cross native
+        # or canadian cross toolchain and build compilers differ from host ones
+        return self.host is None
+
+    def libc_archive_version(self) -> str:
+        # version of the LIBC_META archive, mingw-w64 (not cygwin) for cygwin
+        return getattr(self, f"{LIBC_META[self.libc].name}_version")
+
+    def libc_package(self) -> AutotoolsPackage:
+        libc_name = self.libc.name()
+        configure_deps = [
+            f"$build_targets_dir/extract-{libc_name}",
+            "$build_targets_dir/install-gcc-all-gcc",
+        ]
+        configure_env = [
+            "CROSS_COMPILE=${target}-",
+            "$target_cc",
+            # TODO - Add support for CFLAGS
+        ]
+        configure_flags = [
+            "--prefix=",
+            "--host=$target",
+        ]
+        build_deps = []
+        makefile = "Makefile"
 
-    def libc_version(self) -> str:
         match self.libc:
             case LibC.GLIBC:
-                return self.glibc_version
-            case LibC.MSVCRT | LibC.UCRT:
-                return self.mingw_w64_version
+                configure_flags.extend([
+                    "--disable-multilib",
+                    "--disable-werror",
+                    "--with-headers=$build_sysroot_dir/usr/include",
+                ])
+                configure_deps.append(
+                    "$build_targets_dir/install-linux-headers-sysroot")
+                build_deps.append(
+                    "$build_targets_dir/install-gcc-all-target-libgcc")
             case LibC.MUSL:
-                return self.musl_version
-            case LibC.NEWLIB_CYGWIN:
-                return self.cygwin_version
+                configure_env.append(
+                    'LIBCC="$root_dir/$gcc_build_dir/$target/libgcc/libgcc.a"')
+
+                if self.linux_headers:
+                    configure_deps.append(
+                        "$build_targets_dir/install-linux-headers-sysroot")
+
+                build_deps.append(
+                    "$build_targets_dir/build-gcc-all-target-libgcc")
+                # musl's configure is not autoconf and writes config.mak
+                makefile = "config.mak"
+
+        return AutotoolsPackage(
+            libc_name,
+            f"{libc_name} ${libc_name}_version",
+            f"${libc_name}_build_dir",
+            configure=f"../{libc_name}-${libc_name}_version/configure",
+            configure_env=tuple(configure_env),
+            configure_flags=tuple(configure_flags),
+            configure_deps=tuple(configure_deps),
+            makefile=makefile,
+            build_deps=tuple(build_deps),
+            sysroot_deps=("$build_targets_dir/build-sysroot",),
+        )
+
+    def write_autotools_configure(self, w: Writer, package: AutotoolsPackage) -> None:
+        cmd = [
+            f"rm -rf {package.build_dir}",
+            f"mkdir {package.build_dir}",
+            f"cd {package.build_dir}",
+        ]
+        cmd.append(" ".join([
+            "$env_path",
+            *package.configure_env,
+            package.configure,
+            *package.configure_flags,
+        ]))
+
+        w.rule(
+            f"configure-{package.name}",
+            " && ".join(cmd),
+            description=f"Configuring {package.description}",
+            restat=True,
+        )
+        w.newline()
+        w.build(
+            package.makefile_path(),
+            f"configure-{package.name}",
+            implicit=list(package.configure_deps),
+            pool="configure_pool",
+        )
+        w.newline()
+
+    def write_autotools_make(self, w: Writer, package: AutotoolsPackage) -> None:
+        make = " ".join([
+            "$env_path",
+            *package.make_env,
+            "$make_cmd",
+        ])
+        make_flags = " ".join(['MAKE="$make_cmd"', *package.make_flags])
+
+        w.rule(
+            f"build-{package.name}",
+            f"cd {package.build_dir} && {make} {make_flags} && touch $root_dir/$out",
+            description=f"Building {package.description}",
+        )
+        w.newline()
+        w.build(
+            f"$build_targets_dir/build-{package.name}",
+            f"build-{package.name}",
+            implicit=[package.makefile_path(), *package.build_deps],
+            pool="heavy_pool",
+        )
+        w.newline()
+
+        for (suffix, destdir, deps) in (
+            ("-sysroot", "$build_sysroot_dir/usr", package.sysroot_deps),
+            ("", "$install_dir/$target", ()),
+        ):
+            cmd = [
+                f"cd {package.build_dir}",
+                f"{make} install DESTDIR={destdir} {make_flags}",
+                *(i.format(destdir=destdir) for i in package.post_install),
+                "touch $root_dir/$out",
+            ]
+            where = f" at {destdir}" if suffix else ""
+
+            w.rule(
+                f"install-{package.name}{suffix}",
+                " && ".join(cmd),
+                description=f"Installing {package.description}{where}",
+            )
+            w.newline()
+            w.build(
+                f"$build_targets_dir/install-{package.name}{suffix}",
+                f"install-{package.name}{suffix}",
+                implicit=[f"$build_targets_dir/build-{package.name}", *deps],
+                # only the final install is worth watching as it happens
+                pool=None if suffix else "console",
+                # both installs run make install in the same build dir
+                order_only=None if suffix else [f"$build_targets_dir/install-{package.name}-sysroot"],
+            )
+            w.newline()
 
     def write_variables(self, w: Writer) -> None:
         w.comment("this file is generated from configure.py")
@@ -297,8 +674,11 @@ class Args:
         w.variable("host", self.host)
         w.newline()
 
-        w.variable("cc", self.cc)
-        w.variable("cxx", self.cxx)
+        if self._wrapper:
+            w.variable("cc_wrapper", self._wrapper)
+
+        w.variable("cc", self._resolved_cc)
+        w.variable("cxx", self._resolved_cxx)
 
         if not self.is_cross():
             w.variable("cc_build", self.cc_build)
@@ -320,14 +700,12 @@ class Args:
         w.variable("mpc_version", self.mpc_version)
         w.variable("mpfr_version", self.mpfr_version)
 
-        match self.libc:
-            case LibC.MSVCRT | LibC.UCRT:
-                w.variable("mingw_w64_version", self.mingw_w64_version)
-            case LibC.NEWLIB_CYGWIN:
-                w.variable("cygwin_version", self.cygwin_version)
-                w.variable("mingw_w64_version", self.mingw_w64_version)
-            case _:
-                w.variable(f"{self.libc.name()}_version", self.libc_version())
+        libc_meta = LIBC_META[self.libc]
+
+        if self.libc.is_newlib_cygwin():
+            w.variable("cygwin_version", self.cygwin_version)
+
+        w.variable(f"{libc_meta.name}_version", self.libc_archive_version())
 
         w.newline()
 
@@ -338,35 +716,36 @@ class Args:
 
         w.variable("linux_site", LINUX_SITE)
 
-        match self.libc:
-            case LibC.MSVCRT | LibC.UCRT:
-                w.variable("mingw_w64_site", MINGW_W64_SITE)
-            case LibC.MUSL:
-                w.variable("musl_site", MUSL_SITE)
-            case LibC.NEWLIB_CYGWIN:
-                arch = self.target.split("-")[0]
+        if self.libc.is_newlib_cygwin():
+            arch = self.triple.arch
 
-                if arch in ["x86_64", "amd64", "x64"]:
-                    w.variable("cygwin_mirror_site",
-                               CYGWIN_x86_64_MIRROR_SITE + "/x86_64")
-                elif (arch.startswith("i") and arch.endswith("86")) or arch == "x86":
-                    w.variable("cygwin_mirror_site",
-                               CYGWIN_x86_MIRROR_SITE + "/x86")
+            if arch in ["x86_64", "amd64", "x64"]:
+                w.variable("cygwin_mirror_site",
+                           CYGWIN_x86_64_MIRROR_SITE + "/x86_64")
+            elif self.triple.is_ix86() or arch == "x86":
+                w.variable("cygwin_mirror_site",
+                           CYGWIN_x86_MIRROR_SITE + "/x86")
 
-                w.variable("mingw_w64_site", MINGW_W64_SITE)
+        if libc_meta.site:
+            w.variable(f"{libc_meta.name}_site", libc_meta.site)
 
         w.newline()
-        w.variable("download_cmd", "curl -Lo")
+        w.variable("download_cmd", self._download)
         w.variable(
             "make_cmd",
-            f"{self._make} -j {os.cpu_count()} MULTILIB_OSDIRNAMES= ac_cv_prog_lex_root=lex.yy",
+            f"{self._make} -j {CPU_COUNT} MULTILIB_OSDIRNAMES= ac_cv_prog_lex_root=lex.yy",
             # INFO_DEPS= infodir= MAKEINFO=false
         )
         w.newline()
+        # lets independent configures overlap, unlike console
+        w.pool("configure_pool", CPU_COUNT)
+        # the big makes each use every cpu already, so run them one at a time
+        w.pool("heavy_pool", 1)
+        w.newline()
         w.comment("edit below this line carefully")
         w.newline()
 
-        w.variable("root_dir", Path(".").absolute())
+        w.variable("root_dir", ROOT_DIR)
         w.variable("build_dir", "build")
         w.variable("build_sysroot_dir", "$root_dir/$build_dir/sysroot")
         w.variable("build_targets_dir", "$build_dir/targets")
@@ -374,68 +753,61 @@ class Args:
         w.variable("install_dir", "$root_dir/toolchain")
         w.newline()
 
-        env_vars = '$env_path CC="$cc" CXX="$cxx" CFLAGS="$cc_flags" CXXFLAGS="$cxx_flags" LDFLAGS="$ld_flags"'
+        wrapper = "$cc_wrapper " if self._wrapper else ""
+        env_path = 'PATH="$install_dir/bin:$$PATH"'
+        env_vars = f'$env_path CC="{wrapper}$cc" CXX="{wrapper}$cxx" CFLAGS="$cc_flags" CXXFLAGS="$cxx_flags" LDFLAGS="$ld_flags"'
 
         if not self.is_cross():
-            env_vars += ' CC_FOR_BUILD="$cc_build" CXX_FOR_BUILD="$cxx_build"'
+            env_vars += f' CC_FOR_BUILD="{wrapper}$cc_build" CXX_FOR_BUILD="{wrapper}$cxx_build"'
+
+        # keep the cache next to the build so that reruns of ninja hit it, the
+        # target gcc is rebuilt in place so compare it by content, not mtime
+        match self._wrapper:
+            case "ccache":
+                env_path += ' CCACHE_DIR="$root_dir/.ccache" CCACHE_BASEDIR="$root_dir" CCACHE_COMPILERCHECK=content CCACHE_SLOPPINESS=time_macros,file_macro'
+            case "sccache":
+                env_path += ' SCCACHE_DIR="$root_dir/.sccache" SCCACHE_IDLE_TIMEOUT=0'
 
-        w.variable("env_path", 'PATH="$install_dir/bin:$$PATH"')
+        w.variable("env_path", env_path)
         w.variable("env_vars", env_vars)
+        # the gcc built by install-gcc-all-gcc, for the crt and libc
+        w.variable(
+            "target_cc",
+            f'CC="{wrapper}${{target}}-gcc --sysroot=$build_sysroot_dir"',
+        )
         w.newline()
 
+    @_step
     def write_step_download_extract(self, w: Writer, step_no: int) -> None:
         w.comment(f"step {step_no} - download, extract and patch archives")
         w.newline()
 
-        download_targets = ["binutils", "gcc", "gmp"]
-
-        if self.gcc_with_isl:
-            download_targets.append("isl")
-
-        if self.linux_headers:
-            download_targets.append("linux")
-
-        download_targets.extend(["mpc", "mpfr"])
-
-        if self.libc.requires_mingw_w64():
-            download_targets.append("mingw_w64")
-        else:
-            download_targets.append(self.libc.name())
-
-        for name in download_targets:
-            compression = "xz"
-
-            if name in ["mpc", "musl"]:
-                compression = "gz"
-            elif name == "mingw_w64":
-                compression = "bz2"
-
+        for component in self._components:
             w.variable(
-                f"{name}_tarball",
-                f"$download_dir/{name.replace('_', '-')}-${name}_version.tar.{compression}",
+                f"{component.name}_tarball",
+                f"$download_dir/{component.name.replace('_', '-')}-${component.name}_version.tar.{component.compression}",
             )
 
         w.newline()
 
         if self.libc.is_newlib_cygwin():
-            download_targets.append("cygwin_devel")
             w.variable(
                 "cygwin_devel_tarball",
                 "$download_dir/cygwin-devel-$cygwin_version.tar.xz",
             )
             w.newline()
 
-        for name in download_targets:
-            match name:
-                case "cygwin_devel":
-                    w.variable("cygwin_devel_dir",
-                               "$build_dir/cygwin-devel-$cygwin_version")
-                case "mingw_w64":
-                    w.variable("mingw_w64_dir",
-                               "$build_dir/mingw-w64-v$mingw_w64_version")
-                case _:
-                    w.variable(f"{name}_dir",
-                               f"$build_dir/{name}-${name}_version")
+        for component in self._components:
+            if component.name == "mingw_w64":
+                w.variable("mingw_w64_dir",
+                           "$build_dir/mingw-w64-v$mingw_w64_version")
+            else:
+                w.variable(f"{component.name}_dir",
+                           f"$build_dir/{component.name}-${component.name}_version")
+
+        if self.libc.is_newlib_cygwin():
+            w.variable("cygwin_devel_dir",
+                       "$build_dir/cygwin-devel-$cygwin_version")
 
         w.newline()
 
@@ -446,153 +818,83 @@ class Args:
         )
         w.newline()
 
-        w.build(
-            "$binutils_tarball",
-            "download-tarball",
-            pool="console",
-            variables={
-                "url": "$gnu_site/binutils/binutils-$binutils_version.tar.xz"
-            },
-        )
-        w.newline()
-        w.build(
-            "$gcc_tarball",
-            "download-tarball",
-            pool="console",
-            variables={
-                "url": "$gnu_site/gcc/gcc-$gcc_version/gcc-$gcc_version.tar.xz"
-            },
-        )
-        w.newline()
-        w.build(
-            "$gmp_tarball",
-            "download-tarball",
-            pool="console",
-            variables={"url": "$gnu_site/gmp/gmp-$gmp_version.tar.xz"},
-        )
-        w.newline()
-
-        if self.gcc_with_isl:
-            w.build(
-                "$isl_tarball",
-                "download-tarball",
-                pool="console",
-                variables={"url": "$isl_site/isl-$isl_version.tar.xz"},
-            )
-            w.newline()
-
-        if self.linux_headers:
+        for component in self._components:
             w.build(
-                "$linux_tarball",
+                f"${component.name}_tarball",
                 "download-tarball",
-                pool="console",
-                variables={"url": "$linux_site/linux-$linux_version.tar.xz"},
+                variables={"url": component.url},
             )
             w.newline()
 
-        w.build(
-            "$mpc_tarball",
-            "download-tarball",
-            pool="console",
-            variables={"url": "$gnu_site/mpc/mpc-$mpc_version.tar.gz"},
-        )
-        w.newline()
-        w.build(
-            "$mpfr_tarball",
-            "download-tarball",
-            pool="console",
-            variables={"url": "$gnu_site/mpfr/mpfr-$mpfr_version.tar.xz"},
-        )
-        w.newline()
-
-        tarball_name = ""
-        url = ""
-
-        match self.libc:
-            case LibC.MSVCRT | LibC.NEWLIB_CYGWIN | LibC.UCRT:
-                tarball_name = "mingw_w64"
-                url = "$mingw_w64_site/mingw-w64-v$mingw_w64_version.tar.bz2"
-            case LibC.GLIBC:
-                tarball_name = "glibc"
-                url = "$gnu_site/glibc/glibc-$glibc_version.tar.xz"
-            case LibC.MUSL:
-                tarball_name = "musl"
-                url = "$musl_site/releases/musl-$musl_version.tar.gz"
-
-        w.build(
-            f"${tarball_name}_tarball",
-            "download-tarball",
-            pool="console",
-            variables={"url": url},
-        )
-        w.newline()
-
         if self.libc.is_newlib_cygwin():
             w.build(
                 "$cygwin_devel_tarball",
                 "download-tarball",
-                pool="console",
                 variables={
                     "url": "$cygwin_mirror_site/release/cygwin/cygwin-devel/cygwin-devel-${cygwin_version}-1.tar.xz"},
             )
             w.newline()
 
+        # a tarball downloaded again with the same content and patches is not
+        # extracted again, restat then prunes everything built from it
+        unchanged = " && ".join([
+            "sha256sum $in $patches > $out.sha256.new",
+            "cmp -s $out.sha256.new $out.sha256",
+            "[ -d $extracted_dir ]",
+            "[ -e $out ]",
+        ])
+        extract = " && ".join([
+            "rm -rf $extracted_dir",
+            # not a pipe, tar fails when the decompressor does
+            "tar -x $tar_flags -f $in -C $build_dir",
+            "cd $extracted_dir",
+            "$patch_command",
+            "mv $root_dir/$out.sha256.new $root_dir/$out.sha256",
+            "touch $root_dir/$out",
+        ])
+
         w.rule(
             "extract-tar",
-            "rm -rf $extracted_dir && tar -x${compression}f $in -C $build_dir && cd $extracted_dir && $patch_command && touch ../../$out",
+            f"{unchanged} || {{ {extract}; }}",
             description="Extracting $in",
+            restat=True,
         )
         w.newline()
 
-        name_version_tuples = [
-            ("binutils", self.binutils_version),
-            ("gcc", self.gcc_version),
-            ("gmp", self.gmp_version),
-        ]
+        patches = {}
 
-        if self.gcc_with_isl:
-            name_version_tuples.append(("isl", self.isl_version))
+        if not self.no_patches:
+            patches = {
+                component.name: Patch(component.name.replace("_", "-"), component.version)
+                for component in self._components
+            }
+            Patch.preload(patches.values())
 
-        if self.linux_headers:
-            name_version_tuples.append(("linux", self.linux_version))
+        for component in self._components:
+            name = component.name
+            patch_files = []
+            decompress = self._decompressors.get(component.compression)
+            patch = patches.get(name)
 
-        name_version_tuples.extend([
-            ("mpc", self.mpc_version),
-            ("mpfr", self.mpfr_version),
-        ])
-
-        if self.libc.requires_mingw_w64():
-            name_version_tuples.append(("mingw_w64", self.mingw_w64_version))
-        else:
-            name_version_tuples.append((self.libc.name(), self.libc_version()))
+            if patch and patch.exists():
+                patch_files = patch.files()
 
-        for (name, version) in name_version_tuples:
-            compression = "J"
-            patch_command = "patch -p 1"
-
-            if name in ["mpc", "musl"]:
-                compression = "x"
-            if name == "mingw_w64":
-                compression = "j"
-
-            if not self.no_patches:
-                patch = Patch(name.replace("_", "-"), version)
-
-                if patch.exists():
-                    for patch_file in patch.files():
-                        patch_command += f" -i ../../{patch_file}"
-
-            if patch_command == "patch -p 1":
+            if patch_files:
+                patch_command = " ".join(
+                    ["patch -p 1", *(f"-i $root_dir/{i}" for i in patch_files)])
+            else:
                 patch_command = "true"
 
             w.build(
                 f"$build_targets_dir/extract-{name}",
                 "extract-tar",
                 inputs=[f"${name}_tarball"],
+                implicit=patch_files,
                 variables={
-                    "compression": compression,
+                    "tar_flags": f'-I "{decompress}"' if decompress else f"-{TAR_FLAGS[component.compression]}",
                     "extracted_dir": f"${name}_dir",
                     "patch_command": patch_command,
+                    "patches": patch_files or None,
                 },
             )
             w.newline()
@@ -615,6 +917,7 @@ class Args:
             )
             w.newline()
 
+    @_step
     def write_step_binutils(self, w: Writer, step_no: int) -> None:
         w.comment(f"step {step_no} - build binutils")
         w.newline()
@@ -623,8 +926,9 @@ class Args:
 
         w.rule(
             "configure-binutils",
-            f'rm -rf $binutils_build_dir && mkdir $binutils_build_dir && cd $binutils_build_dir && $env_vars ../binutils-$binutils_version/configure {" ".join(self.binutils_flags)} && touch ../../$out',
+            f'rm -rf $binutils_build_dir && mkdir $binutils_build_dir && cd $binutils_build_dir && $env_vars ../binutils-$binutils_version/configure {self._binutils_flags_str} && touch $root_dir/$out',
             description="Configuring binutils $binutils_version",
+            restat=True,
         )
         w.newline()
         w.build(
@@ -637,52 +941,67 @@ class Args:
 
         w.rule(
             "build-binutils",
-            'cd $binutils_build_dir && $env_vars $make_cmd MAKE="$make_cmd" && touch ../../$out',
+            'cd $binutils_build_dir && $env_vars $make_cmd MAKE="$make_cmd" && touch $root_dir/$out',
             description="Building binutils $binutils_version",
+            restat=True,
         )
         w.newline()
         w.build(
             "$build_targets_dir/build-binutils",
             "build-binutils",
             implicit=["$build_targets_dir/configure-binutils"],
-            pool="console",
+            pool="heavy_pool",
         )
         w.newline()
 
         w.rule(
             "install-binutils",
-            'cd $binutils_build_dir && $env_vars $make_cmd install MAKE="$make_cmd" DESTDIR=$install_dir && touch ../../$out',
+            'cd $binutils_build_dir && $env_vars $make_cmd install MAKE="$make_cmd" DESTDIR=$install_dir && touch $root_dir/$out',
             description="Installing binutils $binutils_version",
+            restat=True,
         )
         w.newline()
         w.build(
             "$build_targets_dir/install-binutils",
             "install-binutils",
             implicit=["$build_targets_dir/build-binutils"],
-            pool="console",
         )
         w.newline()
 
+    @_step
     def write_step_sysroot(self, w: Writer, step_no: int) -> None:
         w.comment(f"step {step_no} - create build sysroot dir")
         w.newline()
 
+        links = [
+            ("usr/lib", "usr/lib32"),
+            ("usr/lib", "usr/lib64"),
+            ("usr/include", "include"),
+            ("usr/lib", "lib"),
+            ("usr/lib", "lib32"),
+            ("usr/lib", "lib64"),
+            ("usr/include", "mingw/include"),
+            ("usr/lib", "mingw/lib"),
+            ("usr/lib", "mingw/lib32"),
+            ("usr/lib", "mingw/lib64"),
+        ]
+        check = " && ".join(
+            f"[ -L $build_sysroot_dir/{link} ]" for (_, link) in links)
+        create = " && ".join([
+            "rm -rf $build_sysroot_dir",
+            "mkdir -p $build_sysroot_dir/usr/include $build_sysroot_dir/usr/lib $build_sysroot_dir/mingw",
+            *(f"ln -sf $build_sysroot_dir/{src} $build_sysroot_dir/{link}"
+              for (src, link) in links),
+            "touch $out",
+        ])
+
+        # leave a complete sysroot (and $out) alone so restat can prune
+        # everything that depends on it
         w.rule(
             "build-sysroot",
-            "rm -rf $build_sysroot_dir && "
-            "mkdir -p $build_sysroot_dir/usr/include $build_sysroot_dir/usr/lib $build_sysroot_dir/mingw && "
-            "ln -sf $build_sysroot_dir/usr/lib $build_sysroot_dir/usr/lib32 && "
-            "ln -sf $build_sysroot_dir/usr/lib $build_sysroot_dir/usr/lib64 && "
-            "ln -sf $build_sysroot_dir/usr/include $build_sysroot_dir/include && "
-            "ln -sf $build_sysroot_dir/usr/lib $build_sysroot_dir/lib && "
-            "ln -sf $build_sysroot_dir/usr/lib $build_sysroot_dir/lib32 && "
-            "ln -sf $build_sysroot_dir/usr/lib $build_sysroot_dir/lib64 && "
-            "ln -sf $build_sysroot_dir/usr/include $build_sysroot_dir/mingw/include && "
-            "ln -sf $build_sysroot_dir/usr/lib $build_sysroot_dir/mingw/lib && "
-            "ln -sf $build_sysroot_dir/usr/lib $build_sysroot_dir/mingw/lib32 && "
-            "ln -sf $build_sysroot_dir/usr/lib $build_sysroot_dir/mingw/lib64 && "
-            "touch $out",
+            f"{check} && [ -e $out ] || {{ {create}; }}",
             description="Creating build sysroot dir at $build_sysroot_dir",
+            restat=True,
         )
         w.newline()
         w.build(
@@ -691,128 +1010,111 @@ class Args:
         )
         w.newline()
 
-    def write_step_linux_headers(self, w: Writer, step_no: int) -> None:
-        w.comment(f"step {step_no} - install linux-headers")
+    @_step
+    def write_step_gcc_libs(self, w: Writer, step_no: int) -> None:
+        w.comment(f"step {step_no} - build gcc libraries (gmp, mpfr, mpc, isl)")
         w.newline()
-
-        # https://git.kernel.org/pub/scm/linux/kernel/git/stable/linux.git/tree/arch
-        arch = self.target.split("-")[0]
-
-        if arch.startswith("aarch64"):
-            arch = "arm64"
-        elif arch.startswith("arm"):
-            arch = "arm"
-        elif arch.startswith("i") and arch.endswith("86"):
-            arch = "x86"
-        elif arch.startswith("microblaze"):
-            arch = "microblaze"
-        elif arch.startswith("mips"):
-            arch = "mips"
-        elif arch.startswith("or1k"):
-            arch = "openrisc"
-        elif arch.startswith("powerpc"):
-            arch = "powerpc"
-        elif arch.startswith("riscv"):
-            arch = "riscv"
-        elif arch.startswith("s390"):
-            arch = "s390"
-        elif arch.startswith("sh"):
-            arch = "sh"
-        elif arch.startswith("x86_64"):
-            arch = "x86_64"
-
-        w.variable("arch", arch)
-        w.variable("linux_build_dir", "$build_dir/linux-build")
+        w.variable("host_libs_dir", "$root_dir/$build_dir/host")
         w.newline()
 
-        w.rule(
-            "build-linux-headers",
-            "cd $linux_dir && $env_vars $make_cmd ARCH=$arch mrproper && touch ../../$out",
-            description="Building linux $linux_version (headers)",
-        )
-        w.newline()
-        w.build(
-            "$build_targets_dir/build-linux-headers",
-            "build-linux-headers",
-            implicit=["$build_targets_dir/extract-linux"],
-            pool="console",
-        )
-        w.newline()
+        # gcc would otherwise build these in-tree, one after another
+        libs = [
+            # gcc builds its in-tree gmp without assembly (--host=none-*)
+            ("gmp", ["--disable-assembly"], []),
+            ("mpfr", ["--with-gmp=$host_libs_dir"], ["gmp"]),
+            ("mpc", [
+                "--with-gmp=$host_libs_dir",
+                "--with-mpfr=$host_libs_dir",
+            ], ["gmp", "mpfr"]),
+        ]
 
-        w.rule(
-            "install-linux-headers-sysroot",
-            "rm -rf $linux_build_dir && mkdir $linux_build_dir && cd $linux_dir && $env_vars $make_cmd O=$root_dir/$linux_build_dir ARCH=$arch INSTALL_HDR_PATH=$build_sysroot_dir/usr headers_install && touch ../../$out",
-            description="Installing linux $linux_version (headers) at $build_sysroot_dir/usr",
-        )
-        w.newline()
-        w.build(
-            "$build_targets_dir/install-linux-headers-sysroot",
-            "install-linux-headers-sysroot",
-            implicit=[
-                "$build_targets_dir/build-linux-headers",
-                "$build_targets_dir/build-sysroot",
-            ],
-            pool="console",
-        )
-        w.newline()
+        if self.gcc_with_isl:
+            libs.append(("isl", ["--with-gmp-prefix=$host_libs_dir"], ["gmp"]))
 
-        w.rule(
-            "install-linux-headers",
-            "rm -rf $linux_build_dir && mkdir $linux_build_dir && cd $linux_dir && $env_vars $make_cmd O=$root_dir/$build_dir/linux-build ARCH=$arch INSTALL_HDR_PATH=$install_dir/$target headers_install && touch ../../$out",
-            description="Installing linux $linux_version (headers)",
-        )
-        w.newline()
-        w.build(
-            "$build_targets_dir/install-linux-headers",
-            "install-linux-headers",
-            implicit=["$build_targets_dir/build-linux-headers"],
-            pool="console",
-        )
-        w.newline()
+        for (name, extra_flags, lib_deps) in libs:
+            flags = [
+                "--disable-shared",
+                "--enable-static",
+                "--prefix=$host_libs_dir",
+            ]
 
-    def write_step_configure_gcc(self, w: Writer, step_no: int) -> None:
-        w.comment(f"step {step_no} - configure gcc")
-        w.newline()
-        w.variable("gcc_build_dir", "$build_dir/gcc-build")
-        w.newline()
+            if not self.is_cross():
+                flags.append("--host=$host")
 
-        w.rule(
-            "move-directory",
-            "rm -rf $dst_dir && mv $src_dir $dst_dir && touch $out",
-            description="Moving $src_dir -> $dst_dir",
-        )
-        w.newline()
+            flags.extend(extra_flags)
 
-        move_targets = ["gmp"]
+            w.variable(f"{name}_build_dir", f"$build_dir/{name}-build")
+            w.newline()
 
-        if self.gcc_with_isl:
-            move_targets.append("isl")
+            w.rule(
+                f"configure-{name}",
+                f'rm -rf ${name}_build_dir && mkdir ${name}_build_dir && cd ${name}_build_dir && $env_vars ../{name}-${name}_version/configure {" ".join(flags)} && touch $root_dir/$out',
+                description=f"Configuring {name} ${name}_version",
+                restat=True,
+            )
+            w.newline()
+            w.build(
+                f"$build_targets_dir/configure-{name}",
+                f"configure-{name}",
+                implicit=[f"$build_targets_dir/extract-{name}"] +
+                [f"$build_targets_dir/install-{dep}" for dep in lib_deps],
+            )
+            w.newline()
 
-        move_targets.extend(["mpc", "mpfr"])
-        build_targets_move = []
+            w.rule(
+                f"build-{name}",
+                f'cd ${name}_build_dir && $env_vars $make_cmd MAKE="$make_cmd" && touch $root_dir/$out',
+                description=f"Building {name} ${name}_version",
+                restat=True,
+            )
+            w.newline()
+            w.build(
+                f"$build_targets_dir/build-{name}",
+                f"build-{name}",
+                implicit=[f"$build_targets_dir/configure-{name}"],
+                pool="heavy_pool",
+            )
+            w.newline()
 
-        for name in move_targets:
+            w.rule(
+                f"install-{name}",
+                f'cd ${name}_build_dir && $env_vars $make_cmd install MAKE="$make_cmd" && touch $root_dir/$out',
+                description=f"Installing {name} ${name}_version at $host_libs_dir",
+                restat=True,
+            )
+            w.newline()
             w.build(
-                f"$build_targets_dir/move-{name}",
-                "move-directory",
-                implicit=[f"$build_targets_dir/extract-{name}"],
-                variables={
-                    "src_dir": f"${name}_dir",
-                    "dst_dir": f"$gcc_dir/{name}",
-                },
+                f"$build_targets_dir/install-{name}",
+                f"install-{name}",
+                implicit=[f"$build_targets_dir/build-{name}"],
             )
             w.newline()
-            build_targets_move.append(f"$build_targets_dir/move-{name}")
+
+    @_step
+    def write_step_configure_gcc(self, w: Writer, step_no: int) -> None:
+        w.comment(f"step {step_no} - configure gcc")
+        w.newline()
+        w.variable("gcc_build_dir", "$build_dir/gcc-build")
+        w.newline()
 
         w.rule(
             "configure-gcc",
-            f'rm -rf $gcc_build_dir && mkdir $gcc_build_dir && cd $gcc_build_dir && $env_vars ../gcc-$gcc_version/configure {" ".join(self.gcc_flags)} && touch ../../$out',
+            f'rm -rf $gcc_build_dir && mkdir $gcc_build_dir && cd $gcc_build_dir && $env_vars ../gcc-$gcc_version/configure {self._gcc_flags_str} && touch $root_dir/$out',
             description="Configuring gcc $gcc_version",
+            restat=True,
         )
         w.newline()
 
-        deps = ["$build_targets_dir/extract-gcc"]
-        deps.extend(build_targets_move)
+        deps = [
+            "$build_targets_dir/extract-gcc",
+            "$build_targets_dir/install-gmp",
+            "$build_targets_dir/install-mpc",
+            "$build_targets_dir/install-mpfr",
+        ]
+
+        if self.gcc_with_isl:
+            deps.append("$build_targets_dir/install-isl")
+
         deps.extend([
             "$build_targets_dir/install-binutils",
             "$build_targets_dir/build-sysroot",
@@ -826,6 +1128,7 @@ class Args:
         )
         w.newline()
 
+    @_step
     def write_step_gcc_all_gcc(self, w: Writer, step_no: int) -> None:
         w.comment(f"step {step_no} - build gcc (all-gcc)")
         w.newline()
@@ -837,22 +1140,24 @@ class Args:
 
         w.rule(
             "build-gcc-all-gcc",
-            'cd $gcc_build_dir && $env_vars $make_cmd all-gcc MAKE="$make_cmd" && touch ../../$out',
+            'cd $gcc_build_dir && $env_vars $make_cmd all-gcc MAKE="$make_cmd" && touch $root_dir/$out',
             description="Building gcc $gcc_version (all-gcc)",
+            restat=True,
         )
         w.newline()
         w.build(
             "$build_targets_dir/build-gcc-all-gcc",
             "build-gcc-all-gcc",
             implicit=deps,
-            pool="console",
+            pool="heavy_pool",
         )
         w.newline()
 
         w.rule(
             "install-gcc-all-gcc",
-            'cd $gcc_build_dir && $env_vars $make_cmd install-gcc DESTDIR=$install_dir MAKE="$make_cmd" && touch ../../$out',
+            'cd $gcc_build_dir && $env_vars $make_cmd install-gcc DESTDIR=$install_dir MAKE="$make_cmd" && touch $root_dir/$out',
             description="Installing gcc $gcc_version (all-gcc)",
+            restat=True,
         )
         w.newline()
         w.build(
@@ -863,6 +1168,7 @@ class Args:
         )
         w.newline()
 
+    @_step(when=lambda self: self.libc.requires_mingw_w64())
     def write_step_mingw_w64_headers(self, w: Writer, step_no: int) -> None:
         w.comment(f"step {step_no} - mingw-w64-headers")
         w.newline()
@@ -885,12 +1191,15 @@ class Args:
 
         w.rule(
             "configure-mingw-w64-headers",
-            "rm -rf $mingw_w64_headers_build_dir && "
-            "mkdir $mingw_w64_headers_build_dir && "
-            "cd $mingw_w64_headers_build_dir && "
-            f'$env_vars ../mingw-w64-v$mingw_w64_version/mingw-w64-headers/configure {" ".join(flags)} && '
-            "touch ../../$out",
+            " && ".join([
+                "rm -rf $mingw_w64_headers_build_dir",
+                "mkdir $mingw_w64_headers_build_dir",
+                "cd $mingw_w64_headers_build_dir",
+                f'$env_vars ../mingw-w64-v$mingw_w64_version/mingw-w64-headers/configure {" ".join(flags)}',
+                "touch $root_dir/$out",
+            ]),
             description="Configuring mingw-w64 $mingw_w64_version (headers)",
+            restat=True,
         )
         w.newline()
         w.build(
@@ -905,7 +1214,7 @@ class Args:
             "install-mingw-w64-headers-sysroot",
             "cd $mingw_w64_headers_build_dir && "
             "$env_vars $make_cmd install DESTDIR=$build_sysroot_dir/usr && "
-            "touch ../../$out",
+            "touch $root_dir/$out",
             description="Installing mingw-w64 $mingw_w64_version (headers) at $build_sysroot_dir/usr",
         )
         w.newline()
@@ -924,7 +1233,7 @@ class Args:
             "install-mingw-w64-headers",
             "cd $mingw_w64_headers_build_dir && "
             "$env_vars $make_cmd install DESTDIR=$install_dir/$target && "
-            "touch ../../$out",
+            "touch $root_dir/$out",
             description="Installing mingw-w64 $mingw_w64_version (headers)",
         )
         w.newline()
@@ -936,13 +1245,13 @@ class Args:
         )
         w.newline()
 
+    @_step(when=lambda self: self.libc.requires_mingw_w64())
     def write_step_mingw_w64_crt(self, w: Writer, step_no: int) -> None:
         w.comment(f"step {step_no} - mingw-w64-crt")
         w.newline()
         w.variable("mingw_w64_crt_build_dir", "$build_dir/mingw-w64-crt-build")
         w.newline()
 
-        cc = 'CC="${target}-gcc --sysroot=$build_sysroot_dir"'
         flags = [
             "--prefix=",
             "--host=$target",
@@ -957,110 +1266,44 @@ class Args:
         elif self.libc.is_mingw_w64():
             flags.append(f"--with-default-msvcrt={self.libc.name()}")
 
-        arch = self.target.split("-")[0]
-
-        if arch == "x86_64":
+        if self.triple.arch == "x86_64":
             flags.extend([
                 "--enable-lib64",
                 "--disable-lib32",
             ])
-        elif arch.startswith("i") and arch.endswith("86"):
+        elif self.triple.is_ix86():
             flags.extend([
                 "--enable-lib32",
                 "--disable-lib64",
             ])
 
-        w.rule(
-            "configure-mingw-w64-crt",
-            "rm -rf $mingw_w64_crt_build_dir && "
-            "mkdir $mingw_w64_crt_build_dir && "
-            "cd $mingw_w64_crt_build_dir && "
-            f"$env_path {cc} ../mingw-w64-v$mingw_w64_version/mingw-w64-crt/configure {' '.join(flags)} && "
-            "touch ../../$out",
-            description="Configuring mingw-w64 $mingw_w64_version (crt)",
-        )
-        w.newline()
-        w.build(
-            "$build_targets_dir/configure-mingw-w64-crt",
-            "configure-mingw-w64-crt",
-            implicit=[
-                "$build_targets_dir/install-gcc-all-gcc",
-                "$build_targets_dir/install-mingw-w64-headers-sysroot",
-            ],
-            pool="console",
-        )
-        w.newline()
-
-        w.rule(
-            "build-mingw-w64-crt",
-            "cd $mingw_w64_crt_build_dir && "
-            f'$env_path {cc} $make_cmd MAKE="$make_cmd" && '
-            "touch ../../$out",
-            description="Building mingw-w64 $mingw_w64_version (crt)",
-        )
-        w.newline()
-        w.build(
-            "$build_targets_dir/build-mingw-w64-crt",
-            "build-mingw-w64-crt",
-            implicit=["$build_targets_dir/configure-mingw-w64-crt"],
-            pool="console",
-        )
-        w.newline()
-
-        cmd = [
-            "cd $mingw_w64_crt_build_dir",
-            f'$env_path {cc} $make_cmd install DESTDIR=$build_sysroot_dir/usr',
-        ]
+        post_install = ()
 
         if self.libc.is_newlib_cygwin():
-            cmd.extend([
-                "cp -r $build_sysroot_dir/usr/lib/w32api/* $build_sysroot_dir/usr/lib",
-                "rm -rf $build_sysroot_dir/usr/lib/w32api",
-            ])
-
-        cmd.append("touch ../../$out")
+            post_install = (
+                "cp -r {destdir}/lib/w32api/* {destdir}/lib",
+                "rm -rf {destdir}/lib/w32api",
+            )
 
-        w.rule(
-            "install-mingw-w64-crt-sysroot",
-            " && ".join(cmd),
-            description="Installing mingw-w64 $mingw_w64_version (crt) at $build_sysroot_dir/usr",
-        )
-        w.newline()
-        w.build(
-            "$build_targets_dir/install-mingw-w64-crt-sysroot",
-            "install-mingw-w64-crt-sysroot",
-            implicit=["$build_targets_dir/build-mingw-w64-crt"],
-            pool="console",
+        package = AutotoolsPackage(
+            "mingw-w64-crt",
+            "mingw-w64 $mingw_w64_version (crt)",
+            "$mingw_w64_crt_build_dir",
+            configure="../mingw-w64-v$mingw_w64_version/mingw-w64-crt/configure",
+            configure_env=("$target_cc",),
+            configure_flags=tuple(flags),
+            configure_deps=(
+                "$build_targets_dir/install-gcc-all-gcc",
+                "$build_targets_dir/install-mingw-w64-headers-sysroot",
+            ),
+            make_env=("$target_cc",),
+            post_install=post_install,
         )
-        w.newline()
-
-        cmd = [
-            "cd $mingw_w64_crt_build_dir",
-            f'$env_path {cc} $make_cmd install DESTDIR=$install_dir/$target',
-        ]
-
-        if self.libc.is_newlib_cygwin():
-            cmd.extend([
-                "cp -r $install_dir/$target/lib/w32api/* $install_dir/$target/lib",
-                "rm -rf $install_dir/$target/lib/w32api",
-            ])
-
-        cmd.append("touch ../../$out")
 
-        w.rule(
-            "install-mingw-w64-crt",
-            " && ".join(cmd),
-            description="Installing mingw-w64 $mingw_w64_version",
-        )
-        w.newline()
-        w.build(
-            "$build_targets_dir/install-mingw-w64-crt",
-            "install-mingw-w64-crt",
-            implicit=["$build_targets_dir/build-mingw-w64-crt"],
-            pool="console",
-        )
-        w.newline()
+        self.write_autotools_configure(w, package)
+        self.write_autotools_make(w, package)
 
+    @_step(when=lambda self: self.libc.is_mingw_w64())
     def write_step_mingw_w64_threads(self, w: Writer, step_no: int) -> None:
         w.comment(f"step {step_no} - mingw-w64-threads")
         w.newline()
@@ -1068,112 +1311,130 @@ class Args:
                    "$build_dir/mingw-w64-threads-build")
         w.newline()
 
-        cc = 'CC="${target}-gcc --sysroot=$build_sysroot_dir"'
-        flags = [
-            "--prefix=",
-            "--host=$target",
-            "--with-sysroot=$build_sysroot_dir",
-        ]
+        package = AutotoolsPackage(
+            "mingw-w64-threads",
+            "mingw-w64 $mingw_w64_version (winpthreads)",
+            "$mingw_w64_threads_build_dir",
+            configure="../mingw-w64-v$mingw_w64_version/mingw-w64-libraries/winpthreads/configure",
+            configure_env=("$target_cc",),
+            configure_flags=(
+                "--prefix=",
+                "--host=$target",
+                "--with-sysroot=$build_sysroot_dir",
+            ),
+            configure_deps=(
+                "$build_targets_dir/install-mingw-w64-crt-sysroot",
+            ),
+            make_env=("$target_cc",),
+            make_flags=(
+                'RC="${target}-windres -I$build_sysroot_dir/usr/include"',
+            ),
+        )
+
+        self.write_autotools_configure(w, package)
+        self.write_autotools_make(w, package)
+
+    @_step(when=lambda self: self.libc.is_newlib_cygwin())
+    def write_step_cygwin_devel_install(self, w: Writer, step_no: int) -> None:
+        w.comment(f"step {step_no} - install cygwin-devel")
 
         w.rule(
-            "configure-mingw-w64-threads",
-            "rm -rf $mingw_w64_threads_build_dir && "
-            "mkdir $mingw_w64_threads_build_dir && "
-            "cd $mingw_w64_threads_build_dir && "
-            f"$env_path {cc} ../mingw-w64-v$mingw_w64_version/mingw-w64-libraries/winpthreads/configure {' '.join(flags)} && "
-            "touch ../../$out",
-            description="Configuring mingw-w64 $mingw_w64_version (winpthreads)",
+            "install-cygwin-devel-sysroot",
+            "cp -r $cygwin_devel_dir/usr/* $build_sysroot_dir/usr && "
+            "touch $out",
+            description="Installing cygwin-devel $cygwin_version at $build_sysroot_dir/usr",
         )
         w.newline()
         w.build(
-            "$build_targets_dir/configure-mingw-w64-threads",
-            "configure-mingw-w64-threads",
-            implicit=["$build_targets_dir/install-mingw-w64-crt-sysroot"],
+            "$build_targets_dir/install-cygwin-devel-sysroot",
+            "install-cygwin-devel-sysroot",
+            implicit=["$build_targets_dir/extract-cygwin-devel"],
             pool="console",
         )
         w.newline()
 
         w.rule(
-            "build-mingw-w64-threads",
-            "cd $mingw_w64_threads_build_dir && "
-            f'$env_path {cc} $make_cmd MAKE="$make_cmd" RC="${{target}}-windres -I$build_sysroot_dir/usr/include" && '
-            "touch ../../$out",
-            description="Building mingw-w64 $mingw_w64_version (winpthreads)",
+            "install-cygwin-devel",
+            "cp -r $cygwin_devel_dir/usr/* $install_dir/$target && "
+            "touch $out",
+            description="Installing cygwin-devel $cygwin_version",
         )
         w.newline()
         w.build(
-            "$build_targets_dir/build-mingw-w64-threads",
-            "build-mingw-w64-threads",
-            implicit=["$build_targets_dir/configure-mingw-w64-threads"],
+            "$build_targets_dir/install-cygwin-devel",
+            "install-cygwin-devel",
+            implicit=["$build_targets_dir/extract-cygwin-devel"],
             pool="console",
         )
         w.newline()
 
-        w.rule(
-            "install-mingw-w64-threads-sysroot",
-            "cd $mingw_w64_threads_build_dir && "
-            f'$env_path {cc} $make_cmd install DESTDIR=$build_sysroot_dir/usr MAKE="$make_cmd" && '
-            "touch ../../$out",
-            description="Installing mingw-w64 $mingw_w64_version (winpthreads) at $build_sysroot_dir/usr",
-        )
+    @_step(when=lambda self: not self.libc.requires_mingw_w64() and self.linux_headers)
+    def write_step_linux_headers(self, w: Writer, step_no: int) -> None:
+        w.comment(f"step {step_no} - install linux-headers")
         w.newline()
-        w.build(
-            "$build_targets_dir/install-mingw-w64-threads-sysroot",
-            "install-mingw-w64-threads-sysroot",
-            implicit=["$build_targets_dir/build-mingw-w64-threads"],
-            pool="console",
-        )
+
+        if self.triple.is_ix86():
+            arch = "x86"
+        else:
+            arch = next(
+                (linux_arch for (prefix, linux_arch) in LINUX_ARCHS
+                 if self.triple.arch.startswith(prefix)),
+                self.triple.arch,
+            )
+
+        w.variable("arch", arch)
+        w.variable("linux_build_dir", "$build_dir/linux-build")
         w.newline()
 
         w.rule(
-            "install-mingw-w64-threads",
-            "cd $mingw_w64_threads_build_dir && "
-            f'$env_path {cc} $make_cmd install DESTDIR=$install_dir/$target MAKE="$make_cmd" && '
-            "touch ../../$out",
-            description="Installing mingw-w64 $mingw_w64_version (winpthreads)",
+            "build-linux-headers",
+            "cd $linux_dir && $env_vars $make_cmd ARCH=$arch mrproper && touch $root_dir/$out",
+            description="Building linux $linux_version (headers)",
+            restat=True,
         )
         w.newline()
         w.build(
-            "$build_targets_dir/install-mingw-w64-threads",
-            "install-mingw-w64-threads",
-            implicit=["$build_targets_dir/build-mingw-w64-threads"],
+            "$build_targets_dir/build-linux-headers",
+            "build-linux-headers",
+            implicit=["$build_targets_dir/extract-linux"],
             pool="console",
         )
         w.newline()
 
-    def write_step_cygwin_devel_install(self, w: Writer, step_no: int) -> None:
-        w.comment(f"step {step_no} - install cygwin-devel")
-
         w.rule(
-            "install-cygwin-devel-sysroot",
-            "cp -r $cygwin_devel_dir/usr/* $build_sysroot_dir/usr && "
-            "touch $out",
-            description="Installing cygwin-devel $cygwin_version at $build_sysroot_dir/usr",
+            "install-linux-headers-sysroot",
+            "rm -rf $linux_build_dir && mkdir $linux_build_dir && cd $linux_dir && $env_vars $make_cmd O=$root_dir/$linux_build_dir ARCH=$arch INSTALL_HDR_PATH=$build_sysroot_dir/usr headers_install && touch $root_dir/$out",
+            description="Installing linux $linux_version (headers) at $build_sysroot_dir/usr",
+            restat=True,
         )
         w.newline()
         w.build(
-            "$build_targets_dir/install-cygwin-devel-sysroot",
-            "install-cygwin-devel-sysroot",
-            implicit=["$build_targets_dir/extract-cygwin-devel"],
+            "$build_targets_dir/install-linux-headers-sysroot",
+            "install-linux-headers-sysroot",
+            implicit=[
+                "$build_targets_dir/build-linux-headers",
+                "$build_targets_dir/build-sysroot",
+            ],
             pool="console",
         )
         w.newline()
 
         w.rule(
-            "install-cygwin-devel",
-            "cp -r $cygwin_devel_dir/usr/* $install_dir/$target && "
-            "touch $out",
-            description="Installing cygwin-devel $cygwin_version",
+            "install-linux-headers",
+            "rm -rf $linux_build_dir && mkdir $linux_build_dir && cd $linux_dir && $env_vars $make_cmd O=$root_dir/$build_dir/linux-build ARCH=$arch INSTALL_HDR_PATH=$install_dir/$target headers_install && touch $root_dir/$out",
+            description="Installing linux $linux_version (headers)",
+            restat=True,
         )
         w.newline()
         w.build(
-            "$build_targets_dir/install-cygwin-devel",
-            "install-cygwin-devel",
-            implicit=["$build_targets_dir/extract-cygwin-devel"],
+            "$build_targets_dir/install-linux-headers",
+            "install-linux-headers",
+            implicit=["$build_targets_dir/build-linux-headers"],
             pool="console",
         )
         w.newline()
 
+    @_step(when=_no_mingw_w64_runtime)
     def write_step_configure_libc(self, w: Writer, step_no: int) -> None:
         libc_name = self.libc.name()
 
@@ -1182,59 +1443,39 @@ class Args:
         w.variable(f"{libc_name}_build_dir", f"$build_dir/{libc_name}-build")
         w.newline()
 
-        deps = [
-            f"$build_targets_dir/extract-{self.libc.name()}",
-            "$build_targets_dir/install-gcc-all-gcc",
-        ]
-        env_vars = [
-            "CROSS_COMPILE=${target}-",
-            'CC="${target}-gcc --sysroot=$build_sysroot_dir"',
-            # TODO - Add support for CFLAGS
-        ]
-        flags = [
-            "--prefix=",
-            "--host=$target",
-        ]
+        self.write_autotools_configure(w, self.libc_package())
 
-        match self.libc:
-            case LibC.GLIBC:
-                flags.extend([
-                    "--disable-multilib",
-                    "--disable-werror",
-                    "--with-headers=$build_sysroot_dir/usr/include",
-                ])
-                deps.append("$build_targets_dir/install-linux-headers-sysroot")
-            case LibC.MUSL:
-                env_vars.append(
-                    'LIBCC="$root_dir/$gcc_build_dir/$target/libgcc/libgcc.a"')
+    @_step(when=_no_mingw_w64_runtime)
+    def write_step_libc_headers(self, w: Writer, step_no: int) -> None:
+        libc_name = self.libc.name()
 
-                if self.linux_headers:
-                    deps.append(
-                        "$build_targets_dir/install-linux-headers-sysroot")
+        w.comment(f"step {step_no} - install {libc_name} (headers)")
+        w.newline()
 
+        # lists the headers in a depfile and keeps their checksums in $out,
+        # which is only replaced when one of them changed, so that a reextract
+        # or reconfigure leaving the headers alone does not reinstall them
         w.rule(
-            f"configure-{libc_name}",
-            f'rm -rf ${libc_name}_build_dir && mkdir ${libc_name}_build_dir && cd ${libc_name}_build_dir && $env_path {" ".join(env_vars)} ../{libc_name}-${libc_name}_version/configure {" ".join(flags)} && touch ../../$out',
-            description=f"Configuring {libc_name} ${libc_name}_version",
+            f"scan-{libc_name}-headers",
+            f"find ${libc_name}_dir -name '*.h' | sort | xargs cksum > $out.tmp && "
+            "awk -v out=$out 'BEGIN { printf \"%s:\", out } { printf \" %s\", $$3 } END { print \"\" }' $out.tmp > $out.d && "
+            "if cmp -s $out.tmp $out; then rm $out.tmp; else mv $out.tmp $out; fi",
+            description=f"Scanning {libc_name} ${libc_name}_version (headers)",
+            depfile="$out.d",
+            deps="gcc",
+            restat=True,
         )
         w.newline()
         w.build(
-            f"$build_targets_dir/configure-{libc_name}",
-            f"configure-{libc_name}",
-            implicit=deps,
-            pool="console",
+            f"$build_targets_dir/scan-{libc_name}-headers",
+            f"scan-{libc_name}-headers",
+            implicit=[f"$build_targets_dir/extract-{libc_name}"],
         )
         w.newline()
 
-    def write_step_libc_headers(self, w: Writer, step_no: int) -> None:
-        libc_name = self.libc.name()
-
-        w.comment(f"step {step_no} - install {libc_name} (headers)")
-        w.newline()
-
         w.rule(
             f"install-{libc_name}-headers-sysroot",
-            f'cd ${libc_name}_build_dir && $env_path $make_cmd install-headers DESTDIR=$build_sysroot_dir/usr && touch ../../$out',
+            f'cd ${libc_name}_build_dir && $env_path $make_cmd install-headers DESTDIR=$build_sysroot_dir/usr && touch $root_dir/$out',
             description=f"Installing {libc_name} ${libc_name}_version (headers) at $build_sysroot_dir/usr",
         )
         w.newline()
@@ -1242,26 +1483,30 @@ class Args:
             f"$build_targets_dir/install-{libc_name}-headers-sysroot",
             f"install-{libc_name}-headers-sysroot",
             implicit=[
-                f"$build_targets_dir/configure-{libc_name}",
+                f"$build_targets_dir/scan-{libc_name}-headers",
                 "$build_targets_dir/build-sysroot",
             ],
+            # needs a configured build dir, but not a reinstall on every configure
+            order_only=[self.libc_package().makefile_path()],
             pool="console",
         )
         w.newline()
 
+    @_step(when=_no_mingw_w64_runtime)
     def write_step_gcc_all_target_libgcc(self, w: Writer, step_no: int) -> None:
+        libc_name = self.libc.name()
+
         w.comment(f"step {step_no} - build gcc (all-target-libgcc)")
         w.newline()
 
-        deps = [
-            f"$build_targets_dir/install-{self.libc.name()}-headers-sysroot"]
+        deps = [f"$build_targets_dir/install-{libc_name}-headers-sysroot"]
         sub_make = 'MAKE="$make_cmd"'
 
         match self.libc:
             case LibC.GLIBC:
                 w.rule(
                     "build-glibc-csu",
-                    "cd $glibc_build_dir && $env_path $make_cmd csu/subdir_lib && touch ../../$out",
+                    "cd $glibc_build_dir && $env_path $make_cmd csu/subdir_lib && touch $root_dir/$out",
                     description="Building glibc $glibc_version (csu)",
                 )
                 w.newline()
@@ -1296,7 +1541,7 @@ class Args:
 
         w.rule(
             "build-gcc-all-target-libgcc",
-            f"cd $gcc_build_dir && $env_vars $make_cmd all-target-libgcc {sub_make} && touch ../../$out",
+            f"cd $gcc_build_dir && $env_vars $make_cmd all-target-libgcc {sub_make} && touch $root_dir/$out",
             description="Building gcc $gcc_version (all-target-libgcc)",
         )
         w.newline()
@@ -1304,13 +1549,13 @@ class Args:
             "$build_targets_dir/build-gcc-all-target-libgcc",
             "build-gcc-all-target-libgcc",
             implicit=deps,
-            pool="console",
+            pool="heavy_pool",
         )
         w.newline()
 
         w.rule(
             "install-gcc-all-target-libgcc",
-            f"cd $gcc_build_dir && $env_vars $make_cmd install-target-libgcc DESTDIR=$install_dir {sub_make} && touch ../../$out",
+            f"cd $gcc_build_dir && $env_vars $make_cmd install-target-libgcc DESTDIR=$install_dir {sub_make} && touch $root_dir/$out",
             description="Installing gcc $gcc_version (all-target-libgcc)",
         )
         w.newline()
@@ -1322,65 +1567,16 @@ class Args:
         )
         w.newline()
 
+    @_step(when=_no_mingw_w64_runtime)
     def write_step_build_libc(self, w: Writer, step_no: int) -> None:
         libc_name = self.libc.name()
 
         w.comment(f"step {step_no} - build {libc_name}")
         w.newline()
 
-        deps = []
-
-        match self.libc:
-            case LibC.GLIBC:
-                deps.append("$build_targets_dir/install-gcc-all-target-libgcc")
-            case LibC.MUSL:
-                deps.append("$build_targets_dir/build-gcc-all-target-libgcc")
-
-        w.rule(
-            f"build-{libc_name}",
-            f'cd ${libc_name}_build_dir && $env_path $make_cmd MAKE="$make_cmd" && touch ../../$out',
-            description=f"Building {libc_name} ${libc_name}_version",
-        )
-        w.newline()
-        w.build(
-            f"$build_targets_dir/build-{libc_name}",
-            f"build-{libc_name}",
-            implicit=deps,
-            pool="console",
-        )
-        w.newline()
-
-        w.rule(
-            f"install-{libc_name}-sysroot",
-            f'cd ${libc_name}_build_dir && $env_path $make_cmd install DESTDIR=$build_sysroot_dir/usr MAKE="$make_cmd" && touch ../../$out',
-            description=f"Installing {libc_name} ${libc_name}_version at $build_sysroot_dir",
-        )
-        w.newline()
-        w.build(
-            f"$build_targets_dir/install-{libc_name}-sysroot",
-            f"install-{libc_name}-sysroot",
-            implicit=[
-                f"$build_targets_dir/build-{libc_name}",
-                "$build_targets_dir/build-sysroot",
-            ],
-            pool="console",
-        )
-        w.newline()
-
-        w.rule(
-            f"install-{libc_name}",
-            f'cd ${libc_name}_build_dir && $env_path $make_cmd install DESTDIR=$install_dir/$target MAKE="$make_cmd" && touch ../../$out',
-            description=f"Installing {libc_name} ${libc_name}_version",
-        )
-        w.newline()
-        w.build(
-            f"$build_targets_dir/install-{libc_name}",
-            f"install-{libc_name}",
-            implicit=[f"$build_targets_dir/build-{libc_name}"],
-            pool="console",
-        )
-        w.newline()
+        self.write_autotools_make(w, self.libc_package())
 
+    @_step
     def write_step_build_gcc(self, w: Writer, step_no: int) -> None:
         w.comment(f"step {step_no} - build gcc")
         w.newline()
@@ -1404,7 +1600,7 @@ class Args:
 
         w.rule(
             "build-gcc",
-            'cd $gcc_build_dir && $env_vars $make_cmd MAKE="$make_cmd" && touch ../../$out',
+            'cd $gcc_build_dir && $env_vars $make_cmd MAKE="$make_cmd" && touch $root_dir/$out',
             description="Building gcc $gcc_version",
         )
         w.newline()
@@ -1412,13 +1608,13 @@ class Args:
             "$build_targets_dir/build-gcc",
             "build-gcc",
             implicit=deps,
-            pool="console",
+            pool="heavy_pool",
         )
         w.newline()
 
         w.rule(
             "install-gcc",
-            'cd $gcc_build_dir && $env_vars $make_cmd install MAKE="$make_cmd" DESTDIR=$install_dir && touch ../../$out',
+            'cd $gcc_build_dir && $env_vars $make_cmd install MAKE="$make_cmd" DESTDIR=$install_dir && touch $root_dir/$out',
             description="Installing gcc $gcc_version",
         )
         w.newline()
@@ -1475,31 +1671,32 @@ class Args:
         )
         w.newline()
 
-        install_targets = [
-            "$build_targets_dir/install-binutils",
-            "$build_targets_dir/install-gcc",
-        ]
+        # ninja starts on the inputs of an edge in the order they are listed,
+        # so list the longest chains first and the quick installs last
+        install_targets = ["$build_targets_dir/install-gcc"]
 
         match self.libc:
             case LibC.MSVCRT | LibC.UCRT:
                 install_targets.extend([
+                    "$build_targets_dir/install-mingw-w64-threads",
                     "$build_targets_dir/install-mingw-w64-crt",
                     "$build_targets_dir/install-mingw-w64-headers",
-                    "$build_targets_dir/install-mingw-w64-threads",
                 ])
             case LibC.NEWLIB_CYGWIN:
                 install_targets.extend([
-                    "$build_targets_dir/install-cygwin-devel",
                     "$build_targets_dir/install-mingw-w64-crt",
                     "$build_targets_dir/install-mingw-w64-headers",
+                    "$build_targets_dir/install-cygwin-devel",
                 ])
             case _:
+                install_targets.append(
+                    f"$build_targets_dir/install-{self.libc.name()}")
+
                 if self.linux_headers:
                     install_targets.append(
                         "$build_targets_dir/install-linux-headers")
 
-                install_targets.append(
-                    f"$build_targets_dir/install-{self.libc.name()}")
+        install_targets.append("$build_targets_dir/install-binutils")
 
         w.build(
             "install",
@@ -1520,89 +1717,43 @@ class Args:
         w.default(default_targets)
         w.newline()
 
+    def write_all(self, w: Writer) -> None:
+        self.write_variables(w)
+
+        steps = (fn for (fn, when) in _STEPS if when is None or when(self))
+
+        for (step_no, fn) in enumerate(steps, 1):
+            fn(self, w, step_no)
+
+        self.write_clean_targets(w)
+        self.write_install_targets(w)
+        self.write_default_targets(w)
+
     def ninja(self) -> None:
-        step_no = 1
         print("Writing build.ninja")
-        with open("build.ninja", "w") as f:
-            w = Writer(f)
-
-            self.write_variables(w)
-            self.write_step_download_extract(w, step_no)
-            step_no += 1
-            self.write_step_binutils(w, step_no)
-            step_no += 1
-            self.write_step_sysroot(w, step_no)
-            step_no += 1
-            self.write_step_configure_gcc(w, step_no)
-            step_no += 1
-            self.write_step_gcc_all_gcc(w, step_no)
-            step_no += 1
-
-            match self.libc:
-                case LibC.MSVCRT | LibC.UCRT:
-                    self.write_step_mingw_w64_headers(w, step_no)
-                    step_no += 1
-                    self.write_step_mingw_w64_crt(w, step_no)
-                    step_no += 1
-                    self.write_step_mingw_w64_threads(w, step_no)
-                    step_no += 1
-                case LibC.NEWLIB_CYGWIN:
-                    self.write_step_mingw_w64_headers(w, step_no)
-                    step_no += 1
-                    self.write_step_mingw_w64_crt(w, step_no)
-                    step_no += 1
-                    self.write_step_cygwin_devel_install(w, step_no)
-                    step_no += 1
-                case _:
-                    if self.linux_headers:
-                        self.write_step_linux_headers(w, step_no)
-                        step_no += 1
-
-                    self.write_step_configure_libc(w, step_no)
-                    step_no += 1
-                    self.write_step_libc_headers(w, step_no)
-                    step_no += 1
-                    self.write_step_gcc_all_target_libgcc(w, step_no)
-                    step_no += 1
-                    self.write_step_build_libc(w, step_no)
-                    step_no += 1
-
-            self.write_step_build_gcc(w, step_no)
-            step_no += 1
-            self.write_clean_targets(w)
-            self.write_install_targets(w)
-            self.write_default_targets(w)
+        buf = io.StringIO()
+        self.write_all(Writer(buf))
+        # one write, without newline translation on windows
+        Path("build.ninja").write_text(buf.getvalue(), newline="\n")
 
 
 def main() -> None:
     args = cli.parse()
 
-    match args.libc:
-        case "auto":
-            if "cygwin" in args.target:
-                args.libc = LibC.NEWLIB_CYGWIN
-            elif "gnu" in args.target:
-                args.libc = LibC.GLIBC
-            elif "mingw" in args.target:
-                args.libc = LibC.UCRT
-            elif "musl" in args.target:
-                args.libc = LibC.MUSL
-            else:
-                print(
-                    "Error: Cannot determine which libc implemention to use. "
-                    "Use --libc flag to explicitly specify it."
-                )
-                sys.exit(1)
-        case "glibc":
-            args.libc = LibC.GLIBC
-        case "msvcrt":
-            args.libc = LibC.MSVCRT
-        case "musl":
-            args.libc = LibC.MUSL
-        case "newlib-cygwin":
-            args.libc = LibC.NEWLIB_CYGWIN
-        case "ucrt":
-            args.libc = LibC.UCRT
+    if args.libc == "auto":
+        args.libc = next(
+            (libc for (part, libc) in LIBC_TARGETS if part in args.target),
+            None,
+        )
+
+        if args.libc is None:
+            print(
+                "Error: Cannot determine which libc implemention to use. "
+                "Use --libc flag to explicitly specify it."
+            )
+            sys.exit(1)
+    else:
+        args.libc = LIBC_NAMES[args.libc]
 
     match args.linux_headers:
         case "auto" | "enabled":
@@ -1625,7 +1776,7 @@ def main() -> None:
     #         sys.exit(1)
 
     # print("using")
-    args = Args(args)
+    args = Args.from_namespace(args)
     failed = args.try_get_tools()
 
     if failed:
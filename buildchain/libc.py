@@ -9,31 +9,24 @@ class LibC(Enum):
     UCRT = 5
 
     def is_mingw_w64(self) -> bool:
-        return self == LibC.MSVCRT or self == LibC.UCRT
+        return self in _MINGW_W64
 
     def is_newlib_cygwin(self) -> bool:
         return self == LibC.NEWLIB_CYGWIN
 
     def name(self) -> str:
-        match self:
-            case LibC.NEWLIB_CYGWIN:
-                return "newlib-cygwin"
-
-            case LibC.GLIBC:
-                return "glibc"
-
-            case LibC.MSVCRT:
-                return "msvcrt"
-
-            case LibC.MUSL:
-                return "musl"
-
-            case LibC.UCRT:
-                return "ucrt"
+        return _NAMES[self]
 
     def requires_mingw_w64(self) -> bool:
-        match self:
-            case LibC.MSVCRT | LibC.UCRT | LibC.NEWLIB_CYGWIN:
-                return True
-            case _:
-                return False
+        return self in _REQUIRES_MINGW_W64
+
+
+_NAMES = {
+    LibC.GLIBC: "glibc",
+    LibC.MSVCRT: "msvcrt",
+    LibC.MUSL: "musl",
+    LibC.NEWLIB_CYGWIN: "newlib-cygwin",
+    LibC.UCRT: "ucrt",
+}
+_MINGW_W64 = frozenset({LibC.MSVCRT, LibC.UCRT})
+_REQUIRES_MINGW_W64 = _MINGW_W64 | {LibC.NEWLIB_CYGWIN}
@@ -1,5 +1,6 @@
 
-import os
+import io
+from dataclasses import dataclass, field
 from pathlib import Path
 from ..ninja_syntax import Writer
 
@@ -8,26 +9,67 @@ CYGWIN_MIRROR_x86 = "https://mirrors.kernel.org/sourceware/cygwin-archive/202211
 CYGWIN_MIRROR_x86_64 = "https://mirrors.kernel.org/sourceware/cygwin"
 CYGWIN_SITE = "https://cygwin.com"
 
+ROOT_DIR = Path.cwd().joinpath("cygwin").as_posix()
+
+# {arch} is replaced with the cygwin arch
+PACKAGES = (
+    # "autoconf",
+    # "automake",
+    # "busybox",
+    # "cocom",
+    # "cygutils-extra",
+    # "dblatex",
+    # "dejagnu",
+    # "docbook-xml45",
+    # "docbook-xsl",
+    # "docbook2X",
+    # "gcc-g++",
+    # "gettext-devel",
+    # "libiconv",
+    # "libiconv-devel",
+    # "libzstd-devel",
+    # "make",
+    # "mingw64-{arch}-gcc-g++",
+    # "mingw64-{arch}-zlib",
+    "patch",
+    # "perl",
+    # "python39-lxml",
+    # "python39-ply",
+    # "texlive-collection-fontsrecommended",
+    # "texlive-collection-latexrecommended",
+    # "texlive-collection-pictures",
+    # "xmlto",
+    # "zlib-devel",
+)
+
+# https://github.com/cygwin/cygwin-install-action/blob/master/action.yml
+# https://github.com/cygwin/cygwin/blob/main/.github/workflows/cygwin.yml
+INSTALL_CYGWIN = (
+    "$setup_file -qgNnO "
+    "-l $root_dir/$cygwin_install_dir/cache "
+    "-R $root_dir/$cygwin_install_dir "
+    "-s $cygwin_mirror_site "
+    "-P {packages}{unsupported}"
+)
+
+@dataclass(slots=True)
 class Cygwin:
-    target = str,
-    version = str,
+    target: str
+    version: str
+    arch: str = field(init=False)
 
-    def __init__(self, target: str, version: str) -> None:
-        self.target = target
-        self.version = version
-
-    def arch(self) -> str:
+    def __post_init__(self) -> None:
         arch = self.target.split("-")[0]
 
         if arch in ["x86_64", "amd64", "x64"]:
-            return "x86_64"
+            self.arch = "x86_64"
         elif (arch.startswith("i") and arch.endswith("86")) or arch == "x86":
-            return "x86"
+            self.arch = "x86"
         else:
-            return arch
+            self.arch = arch
 
     def write_step_variables(self, w: Writer) -> None:
-        arch = self.arch()
+        arch = self.arch
         mirror_site = CYGWIN_MIRROR_x86_64
 
         if arch == "x86":
@@ -36,7 +78,7 @@ class Cygwin:
         w.variable("cygwin_mirror_site", mirror_site)
         w.newline()
 
-        w.variable("root_dir", str(Path(".").absolute().joinpath("cygwin")).replace("\\", "/"))
+        w.variable("root_dir", ROOT_DIR)
         w.variable("download_dir", "downloads")
         w.variable("cygwin_install_dir", "$download_dir/cygwin")
         w.newline()
@@ -48,7 +90,8 @@ class Cygwin:
     def write_step_download_files(self, w: Writer) -> None:
         w.rule(
             "download-file",
-            "curl -Lo $out $url",
+            # resume partial downloads and don't save error pages as $out
+            "curl -L --compressed --fail --retry 5 --retry-delay 2 -C - -o $out $url",
             description="Downloading $url",
         )
         w.newline()
@@ -56,9 +99,8 @@ class Cygwin:
         w.build(
             "$setup_file",
             "download-file",
-            pool="console",
             variables={
-                "url": f"{CYGWIN_SITE}/setup-{self.arch()}.exe"
+                "url": f"{CYGWIN_SITE}/setup-{self.arch}.exe"
             },
         )
         w.newline()
@@ -66,7 +108,6 @@ class Cygwin:
         w.build(
             "$newlib_cygwin_tarball",
             "download-file",
-            pool="console",
             variables={
                 "url": f"{NEWLIB_CYGWIN_SITE}/cygwin-{self.version}.tar.gz"
             },
@@ -74,49 +115,15 @@ class Cygwin:
         w.newline()
 
     def write_step_install_cygwin(self, w: Writer) -> None:
-        arch = self.target.split("-")[0]
+        arch = self.arch
+        packages = ",".join(i.format(arch=arch) for i in PACKAGES)
+        unsupported = " --allow-unsupported-windows" if arch == "x86" else ""
 
-        packages = [
-            # "autoconf",
-            # "automake",
-            # "busybox",
-            # "cocom",
-            # "cygutils-extra",
-            # "dblatex",
-            # "dejagnu",
-            # "docbook-xml45",
-            # "docbook-xsl",
-            # "docbook2X",
-            # "gcc-g++",
-            # "gettext-devel",
-            # "libiconv",
-            # "libiconv-devel",
-            # "libzstd-devel",
-            # "make",
-            # f"mingw64-{arch}-gcc-g++",
-            # f"mingw64-{arch}-zlib",
-            "patch",
-            # "perl",
-            # "python39-lxml",
-            # "python39-ply",
-            # "texlive-collection-fontsrecommended",
-            # "texlive-collection-latexrecommended",
-            # "texlive-collection-pictures",
-            # "xmlto",
-            # "zlib-devel",
-        ]
-
-        # https://github.com/cygwin/cygwin-install-action/blob/master/action.yml
-        # https://github.com/cygwin/cygwin/blob/main/.github/workflows/cygwin.yml
         w.rule(
             "install-cygwin",
-            "$setup_file -qgNnO "
-            "-l $root_dir/$cygwin_install_dir/cache "
-            "-R $root_dir/$cygwin_install_dir "
-            "-s $cygwin_mirror_site "
-            f'-P {",".join(packages)} '
-             + ("--allow-unsupported-windows" if self.arch() == "x86" else ""),
+            INSTALL_CYGWIN.format(packages=packages, unsupported=unsupported),
             description="Installing cygwin at $cygwin_install_dir",
+            restat=True,
         )
         w.newline()
         w.build(
@@ -128,12 +135,23 @@ class Cygwin:
         w.newline()
 
     def ninja(self):
-        if not Path("cygwin").exists():
-            os.mkdir("cygwin")
+        Path("cygwin").mkdir(exist_ok=True)
+
+        buf = io.StringIO()
+        w = Writer(buf)
+        self.write_step_variables(w)
+        self.write_step_download_files(w)
+        self.write_step_install_cygwin(w)
+        manifest = Path("cygwin/build.ninja")
+        content = buf.getvalue()
+
+        # keep the mtime of an identical file, ninja would reload it otherwise
+        try:
+            if manifest.read_text() == content:
+                return
+        except OSError:
+            pass
 
         print("Writing cygwin/build.ninja")
-        with open("cygwin/build.ninja", "w") as f:
-            w = Writer(f)
-            self.write_step_variables(w)
-            self.write_step_download_files(w)
-            self.write_step_install_cygwin(w)
+        # one write, without newline translation on windows
+        manifest.write_text(content, newline="\n")
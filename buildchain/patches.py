@@ -1,16 +1,46 @@
+import functools
 import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List
+from typing import Iterable, List, Tuple
+
+
+# patch dirs don't change while build.ninja is being written
+@functools.lru_cache(maxsize=None)
+def _exists(path: Path) -> bool:
+    return path.exists()
+
+
+@functools.lru_cache(maxsize=None)
+def _files(path: Path) -> Tuple[str, ...]:
+    base = path.as_posix()
+
+    # numbered patches must be applied in order, which scandir doesn't keep
+    with os.scandir(path) as entries:
+        return tuple(sorted(f"{base}/{entry.name}" for entry in entries))
 
 
 class Patch:
-    path = Path,
+    __slots__ = ("path",)
+
+    path: Path
 
     def __init__(self, name: str, version: str):
         self.path = Path(f"patches/{name}-{version}")
 
     def exists(self) -> bool:
-        return self.path.exists()
+        return _exists(self.path)
 
     def files(self) -> List[str]:
-        return [f"{self.path}/{i}".replace("\\", "/") for i in os.listdir(self.path)]
+        return list(_files(self.path))
+
+    @classmethod
+    def preload(cls, patches: Iterable["Patch"]) -> None:
+        # warm up the caches, the dirs can be on a slow or network drive
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(_scan, patches))
+
+
+def _scan(patch: Patch) -> None:
+    if patch.exists():
+        patch.files()
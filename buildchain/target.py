@@ -0,0 +1,13 @@
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True, slots=True)
+class TargetTriple:
+    arch: str
+
+    @classmethod
+    def parse(cls, target: str) -> "TargetTriple":
+        return cls(target.split("-")[0])
+
+    def is_ix86(self) -> bool:
+        return self.arch.startswith("i") and self.arch.endswith("86")
@@ -0,0 +1,36 @@
+import unittest
+
+from buildchain.__main__ import GCC_TRIPLE_FLAGS
+
+
+def flags(target):
+    return [flag for (predicate, flag) in GCC_TRIPLE_FLAGS if predicate(target)]
+
+
+class GccTripleFlagsTest(unittest.TestCase):
+    def test_fdpic(self):
+        for target in [
+            "arm-uclinuxfdpiceabi",
+            "arm-unknown-uclinuxfdpiceabi",
+            "arm-fdpic-linux-musleabi",
+            "sh2eb-linux-muslfdpic",
+        ]:
+            self.assertIn("--enable-fdpic", flags(target), target)
+
+    def test_mips64_abi(self):
+        self.assertEqual(flags("mips64-n32-linux-gnu"), ["--with-abi=n32"])
+        self.assertEqual(flags("mips64-linux-gnun32"), ["--with-abi=n32"])
+        self.assertEqual(flags("mips64el-linux-musl"), ["--with-abi=64"])
+        self.assertEqual(flags("mipsisa64r6-linux-gnuabi64"), ["--with-abi=64"])
+
+    def test_other_abis(self):
+        self.assertEqual(flags("x86_64-linux-gnux32"), ["--with-abi=x32"])
+        self.assertEqual(flags("powerpc64le-linux-musl"), ["--with-abi=elfv2"])
+        self.assertEqual(flags("s390x-linux-gnu"), ["--with-long-double-128"])
+        self.assertEqual(flags("arm-linux-musleabihf"), ["--with-float=hard"])
+        self.assertEqual(flags("mips-linux-muslsf"), ["--with-float=soft"])
+        self.assertEqual(flags("x86_64-linux-musl"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()